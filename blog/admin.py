@@ -1,10 +1,10 @@
 from django.contrib import admin
-from django.db.models import Count, Prefetch
-from blog.models import Post, Tag, Comment
+from django.db.models import Count, F, Prefetch
+from blog.models import ArchivedComment, Job, Post, Tag, Comment
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'published_at', 'likes_count', 'comments_count')
+    list_display = ('title', 'author', 'published_at', 'views_count', 'likes_count', 'comments_count')
     list_select_related = ('author',)
     raw_id_fields = ('likes', 'tags')
     search_fields = ('title', 'author__username')
@@ -22,7 +22,7 @@ class PostAdmin(admin.ModelAdmin):
     likes_count.short_description = 'Likes'
     
     def comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments.count() + obj.archived_comments_count
     comments_count.short_description = 'Comments'
     
     def get_changelist_instance(self, request):
@@ -39,7 +39,9 @@ class PostAdmin(admin.ModelAdmin):
             p['id']: p['comments_count']
             for p in Post.objects.filter(
                 id__in=[obj.id for obj in changelist.result_list]
-            ).annotate(comments_count=Count('comments')).values('id', 'comments_count')
+            ).annotate(
+                comments_count=Count('comments') + F('archived_comments_count')
+            ).values('id', 'comments_count')
         }
         
         for obj in changelist.result_list:
@@ -53,7 +55,10 @@ class PostAdmin(admin.ModelAdmin):
     likes_count.admin_order_field = '_cached_likes_count'
     
     def comments_count(self, obj):
-        return getattr(obj, '_cached_comments_count', obj.comments.count())
+        return getattr(
+            obj, '_cached_comments_count',
+            obj.comments.count() + obj.archived_comments_count,
+        )
     comments_count.admin_order_field = '_cached_comments_count'
 
 @admin.register(Tag)
@@ -96,4 +101,29 @@ class CommentAdmin(admin.ModelAdmin):
     
     def text_preview(self, obj):
         return obj.text[:100] + '...' if len(obj.text) > 100 else obj.text
-    text_preview.short_description = 'Text preview'
\ No newline at end of file
+    text_preview.short_description = 'Text preview'
+
+@admin.register(ArchivedComment)
+class ArchivedCommentAdmin(admin.ModelAdmin):
+    list_display = ('author', 'post', 'published_at', 'archived_at')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('post', 'author')
+    search_fields = ('author__username', 'post__title')
+    date_hierarchy = 'published_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('claimed_by', 'last_error', 'created_at', 'started_at', 'heartbeat_at', 'finished_at')
@@ -0,0 +1,265 @@
+"""
+Read-only JSON API для постов и тегов.
+
+Параметр ?fields= сужает не только ответ, но и SQL-запрос: для каждого поля
+известно, какие колонки, аннотации и связи ему нужны. Списки отдаются
+потоком с курсорной пагинацией, а ETag строится по версии содержимого
+из кеша страниц, поэтому повторный запрос без изменений не читает посты
+из БД. Версия общая для всех процессов, только пока кеш общий (см. blog.W001).
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from blog.models import Post, Tag
+from blog.page_cache import CONTENT_KEY, get_versions
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 1000
+
+POST_FIELDS = {
+    'id': {'only': ['id'], 'get': lambda post: post.id},
+    'title': {'only': ['title'], 'get': lambda post: post.title},
+    'slug': {'only': ['slug'], 'get': lambda post: post.slug},
+    'text': {'only': ['text'], 'get': lambda post: post.text},
+    'teaser_text': {'only': ['text'], 'get': lambda post: post.text[:200]},
+    'published_at': {'only': ['published_at'], 'get': lambda post: post.published_at},
+    'image_url': {
+        'only': ['image'],
+        'get': lambda post: post.image.url if post.image else None,
+    },
+    'author': {
+        'only': ['author__username'],
+        'select_related': 'author',
+        'get': lambda post: post.author.username,
+    },
+    'likes_amount': {
+        'annotate': {'likes_count': models.Count('likes', distinct=True)},
+        'get': lambda post: post.likes_count,
+    },
+    'comments_amount': {
+        'annotate': {'comments_count': (
+            models.Count('comments', distinct=True) + models.F('archived_comments_count')
+        )},
+        'get': lambda post: post.comments_count,
+    },
+    'tags': {
+        'prefetch': models.Prefetch('tags', queryset=Tag.objects.only('title')),
+        'get': lambda post: [tag.title for tag in post.tags.all()],
+    },
+}
+DEFAULT_POST_LIST_FIELDS = [field for field in POST_FIELDS if field != 'text']
+
+TAG_FIELDS = {
+    'id': {'only': ['id'], 'get': lambda tag: tag.id},
+    'title': {'only': ['title'], 'get': lambda tag: tag.title},
+    'posts_count': {
+        'annotate': {'posts_count': models.Count('posts')},
+        'get': lambda tag: tag.posts_count,
+    },
+}
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def get_content_etag(request):
+    version = get_versions([CONTENT_KEY])[CONTENT_KEY]
+    return hashlib.md5(f'{version}:{request.get_full_path()}'.encode()).hexdigest()
+
+
+def api_view(view):
+    """
+    GET/HEAD, ETag по версии содержимого и ошибки в виде JSON.
+
+    Представление вызывается до проверки If-None-Match, чтобы ошибки
+    не превращались в 304 и не получали ETag. Списки постов отдаются
+    потоком, поэтому при 304 запрос за ними так и не выполняется.
+    """
+    @require_safe
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except BadRequest as error:
+            return error_response(str(error), status=400)
+        except Http404:
+            return error_response('Не найдено', status=404)
+        response.headers['ETag'] = quote_etag(get_content_etag(request))
+        return get_conditional_response(request, etag=response.headers['ETag'], response=response)
+
+    return wrapper
+
+
+def error_response(message, status):
+    return JsonResponse(
+        {'error': message},
+        status=status,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def get_requested_fields(request, available_fields, default_fields):
+    if 'fields' not in request.GET:
+        return list(default_fields)
+    fields = [field for field in request.GET['fields'].split(',') if field]
+    unknown_fields = [field for field in fields if field not in available_fields]
+    if unknown_fields or not fields:
+        raise BadRequest(
+            f'Неизвестные поля: {", ".join(unknown_fields)}. '
+            f'Доступны: {", ".join(available_fields)}'
+        )
+    return fields
+
+
+def project(queryset, fields, available_fields, required_columns=()):
+    """Оставляет в запросе только то, что нужно для выбранных полей"""
+    columns = {'id', *required_columns}
+    for field in fields:
+        spec = available_fields[field]
+        columns.update(spec.get('only', []))
+        if 'select_related' in spec:
+            queryset = queryset.select_related(spec['select_related'])
+        if 'prefetch' in spec:
+            queryset = queryset.prefetch_related(spec['prefetch'])
+        if spec.get('annotate'):
+            queryset = queryset.annotate(**spec['annotate'])
+    return queryset.only(*columns)
+
+
+def serialize(obj, fields, available_fields):
+    return {field: available_fields[field]['get'](obj) for field in fields}
+
+
+def encode_cursor(values):
+    # Даты кодируются без округления DjangoJSONEncoder до миллисекунд
+    data = json.dumps(values, default=lambda value: value.isoformat()).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise BadRequest('Некорректный курсор')
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def stream_posts(request, queryset, order_field, parse_order_value):
+    """
+    Отдаёт посты потоком, страница за страницей по курсору.
+
+    Посты упорядочены по убыванию order_field, а при равенстве — по
+    убыванию id. Курсор хранит эту пару для последнего отданного поста,
+    а parse_order_value восстанавливает из неё значение order_field.
+    """
+    fields = get_requested_fields(request, POST_FIELDS, DEFAULT_POST_LIST_FIELDS)
+    limit = get_limit(request)
+
+    if 'cursor' in request.GET:
+        try:
+            order_value, last_id = decode_cursor(request.GET['cursor'])
+            order_value = parse_order_value(order_value)
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise BadRequest('Некорректный курсор')
+        queryset = queryset.filter(
+            models.Q(**{f'{order_field}__lt': order_value})
+            | models.Q(**{order_field: order_value, 'id__lt': last_id})
+        )
+
+    order_columns = [] if order_field in queryset.query.annotations else [order_field]
+    posts = (
+        project(queryset, fields, POST_FIELDS, required_columns=order_columns)
+        .order_by(f'-{order_field}', '-id')[:limit + 1]
+    )
+    return StreamingHttpResponse(
+        encode_posts(posts.iterator(chunk_size=200), fields, limit, order_field),
+        content_type='application/json',
+    )
+
+
+def encode_posts(posts, fields, limit, order_field):
+    yield '{"results": ['
+    last_post = None
+    has_more = False
+    for number, post in enumerate(posts):
+        if number == limit:
+            has_more = True
+            break
+        yield ('' if number == 0 else ', ') + encoder.encode(serialize(post, fields, POST_FIELDS))
+        last_post = post
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor([getattr(last_post, order_field), last_post.id])
+    yield f'], "next_cursor": {encoder.encode(next_cursor)}}}'
+
+
+def parse_datetime(value):
+    return datetime.datetime.fromisoformat(value)
+
+
+@api_view
+def posts_list(request):
+    return stream_posts(request, Post.objects.all(), 'published_at', parse_datetime)
+
+
+@api_view
+def popular_posts_list(request):
+    return stream_posts(request, Post.objects.popular(), 'likes_count', int)
+
+
+@api_view
+def trending_posts_list(request):
+    return stream_posts(request, Post.objects.trending(), 'recent_views', int)
+
+
+@api_view
+def tag_posts_list(request, tag_title):
+    tag = Tag.objects.filter(title=tag_title).only('id').first()
+    if tag is None:
+        raise Http404
+    return stream_posts(request, Post.objects.filter(tags=tag), 'published_at', parse_datetime)
+
+
+@api_view
+def post_detail(request, slug):
+    fields = get_requested_fields(request, POST_FIELDS, POST_FIELDS)
+    post = project(Post.objects.filter(slug=slug), fields, POST_FIELDS).first()
+    if post is None:
+        raise Http404
+    return JsonResponse(
+        serialize(post, fields, POST_FIELDS),
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@api_view
+def tags_list(request):
+    fields = get_requested_fields(request, TAG_FIELDS, TAG_FIELDS)
+    tags = project(Tag.objects.all(), fields, TAG_FIELDS)
+    return JsonResponse(
+        {'results': [serialize(tag, fields, TAG_FIELDS) for tag in tags]},
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False},
+    )
@@ -0,0 +1,49 @@
+"""
+Архив постов по месяцам.
+
+Количество постов за каждый месяц хранится в ArchiveMonth и пересчитывается
+при сохранении и удалении поста только для затронутых месяцев — запросом
+по индексу на published_at, а не GROUP BY по всем постам.
+"""
+import datetime
+
+from django.utils import timezone
+
+from blog.models import ArchiveMonth, Post
+
+
+def get_month(published_at):
+    published_at = timezone.localtime(published_at)
+    return published_at.year, published_at.month
+
+
+def get_month_range(year, month):
+    """Начало и конец месяца. ValueError, если такого месяца нет"""
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def get_month_posts(year, month):
+    start, end = get_month_range(year, month)
+    return Post.objects.filter(published_at__gte=start, published_at__lt=end)
+
+
+def recount_months(months):
+    """Пересчитывает посты за месяцы. True, если хоть одно число изменилось"""
+    changed = False
+    for year, month in set(months):
+        posts_count = get_month_posts(year, month).count()
+        old_count = (
+            ArchiveMonth.objects.filter(year=year, month=month)
+            .values_list('posts_count', flat=True).first()
+        )
+        if posts_count == (old_count or 0):
+            continue
+        changed = True
+        if posts_count:
+            ArchiveMonth.objects.update_or_create(
+                year=year, month=month, defaults={'posts_count': posts_count})
+        else:
+            ArchiveMonth.objects.filter(year=year, month=month).delete()
+    return changed
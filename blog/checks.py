@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from blog.page_cache import is_cache_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or is_cache_shared():
+        return []
+    return [
+        Warning(
+            'Кеш страниц хранится в памяти процесса: сброс страниц в одном '
+            'воркере не дойдёт до остальных, и они будут отдавать устаревшие '
+            'страницы.',
+            hint='Укажите общий CACHE_BACKEND, например FileBasedCache или RedisCache.',
+            id='blog.W001',
+        )
+    ]
@@ -0,0 +1,88 @@
+"""
+Архивирование старых комментариев.
+
+Комментарии старше COMMENTS_ARCHIVE_AFTER_DAYS к постам старше того же
+срока переносятся из Comment в ArchivedComment пачками: каждая пачка
+копируется и удаляется в своей транзакции, так что команду можно прервать
+в любой момент. Сколько комментариев поста ушло в архив, хранится
+в Post.archived_comments_count — счётчики комментариев остаются верными
+без запросов к архиву.
+"""
+import datetime
+from collections import Counter
+
+from django.db import DatabaseError, connection, models, transaction
+from django.utils import timezone
+
+from blog import page_cache
+from blog.models import ArchivedComment, Comment, Post
+from blog.view_counters import get_increments
+
+COMMENT_FIELDS = ['id', 'post_id', 'author_id', 'text', 'published_at']
+
+
+def get_archivable_comments(older_than_days):
+    archive_before = timezone.now() - datetime.timedelta(days=older_than_days)
+    return Comment.objects.filter(
+        published_at__lt=archive_before,
+        post__published_at__lt=archive_before,
+    )
+
+
+def archive_comments(older_than_days, batch_size=1000):
+    """Переносит комментарии в архив и после каждой пачки отдаёт её размер"""
+    comments = get_archivable_comments(older_than_days).order_by('id').values(*COMMENT_FIELDS)
+    while True:
+        with transaction.atomic():
+            batch = list(comments[:batch_size])
+            if not batch:
+                return
+            ArchivedComment.objects.bulk_create(
+                [ArchivedComment(**comment) for comment in batch])
+            delete_comments([comment['id'] for comment in batch])
+            archived_by_post_id = Counter(comment['post_id'] for comment in batch)
+            Post.objects.filter(id__in=archived_by_post_id).update(
+                archived_comments_count=(
+                    models.F('archived_comments_count')
+                    + get_increments('id', archived_by_post_id)
+                )
+            )
+        page_cache.purge(*[page_cache.post_key(post_id) for post_id in archived_by_post_id])
+        yield len(batch)
+
+
+def delete_comments(comment_ids):
+    """
+    Удаляет комментарии одним DELETE без сигналов post_delete:
+    кеш страниц сбрасывается один раз на пачку, а не на каждый комментарий
+    """
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(comment_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', comment_ids)
+
+
+def get_table_sizes(*models_to_measure):
+    """Количество строк и размер на диске в байтах вместе с индексами"""
+    sizes = {}
+    for model in models_to_measure:
+        table = model._meta.db_table
+        sizes[table] = (model.objects.count(), get_disk_size(table))
+    return sizes
+
+
+def get_disk_size(table):
+    """Размер таблицы по dbstat. None, если SQLite собран без неё или база другая"""
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT SUM(dbstat.pgsize) FROM dbstat '
+                'JOIN sqlite_master ON sqlite_master.name = dbstat.name '
+                'WHERE sqlite_master.tbl_name = %s',
+                [table],
+            )
+            return cursor.fetchone()[0] or 0
+    except DatabaseError:
+        return None
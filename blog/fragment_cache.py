@@ -0,0 +1,61 @@
+"""
+Общий кеш отрендеренных карточек постов.
+
+Одна и та же карточка поста попадает на главную, в списки по тегам и в блок
+популярных постов. Фрагмент кешируется по виду карточки, id поста и отпечатку
+тех полей поста, которые эта карточка показывает. Поменялись данные —
+поменялся ключ, поэтому старая разметка не может попасть в кеш под ключом
+свежих данных, а изменения, которых на карточке не видно, например число
+постов у её тегов, ключ не меняют.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# Увеличьте при правке разметки в templates/cards/, чтобы не отдавать старую
+FRAGMENT_MARKUP_VERSION = 2
+# Поля сериализованного поста, которые выводит каждый вид карточки.
+# При правке шаблона в templates/cards/ поправьте и этот список
+CARD_FIELDS = {
+    'slide': ['slug', 'title', 'image_url', 'published_at', 'first_tag_title'],
+    'recent': [
+        'slug', 'title', 'image_url', 'published_at', 'author',
+        'comments_amount', 'teaser_text', 'tag_titles',
+    ],
+    'list': ['slug', 'title', 'image_url', 'author', 'comments_amount', 'teaser_text'],
+    'sidebar': ['slug', 'title', 'published_at', 'author'],
+}
+
+
+def get_card_data(post, variant):
+    data = dict(post, tag_titles=[tag['title'] for tag in post['tags']])
+    return [data[field] for field in CARD_FIELDS[variant]]
+
+
+def get_fragment_key(post, variant):
+    digest = hashlib.md5(repr(get_card_data(post, variant)).encode()).hexdigest()
+    return f'fragment:{FRAGMENT_MARKUP_VERSION}:{variant}:{post["id"]}:{digest}'
+
+
+def render_post_cards(posts, variant):
+    """Собирает карточки из кеша, дорендеривая только отсутствующие"""
+    fragment_keys = [get_fragment_key(post, variant) for post in posts]
+    fragments = cache.get_many(fragment_keys)
+
+    template = None
+    rendered = {}
+    for post, fragment_key in zip(posts, fragment_keys):
+        if fragment_key in fragments:
+            continue
+        if template is None:
+            template = get_template(f'cards/{variant}.html')
+        rendered[fragment_key] = template.render({'post': post})
+
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+    return mark_safe(''.join(fragments[key] for key in fragment_keys))
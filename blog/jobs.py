@@ -0,0 +1,250 @@
+"""
+Фоновые задачи с очередью в БД.
+
+Функция, обёрнутая в @job, получает метод enqueue: он кладёт задачу в
+таблицу Job, а команда run_worker выполняет её в отдельном процессе.
+Воркеры забирают задачи одним UPDATE по статусу, поэтому несколько
+процессов могут безопасно разбирать одну очередь. Пока задача выполняется,
+воркер раз в HEARTBEAT_INTERVAL обновляет heartbeat_at. Задачу, у которой
+пульс пропал дольше чем на STALE_JOB_TIMEOUT, считают брошенной упавшим
+воркером и возвращают в очередь.
+"""
+import datetime
+import logging
+import threading
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, models, transaction
+from django.utils import timezone
+
+from blog.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+HEARTBEAT_INTERVAL = datetime.timedelta(seconds=30)
+STALE_JOB_TIMEOUT = datetime.timedelta(minutes=5)
+
+
+class JobFunction:
+    def __init__(self, func, name, priority, max_attempts, merge_payload=None):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.merge_payload = merge_payload
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, dedupe_key=None, priority=None, **payload):
+        """
+        Ставит задачу в очередь после коммита текущей транзакции.
+
+        Если задача с тем же dedupe_key уже ждёт в очереди,
+        новая не создаётся, а если у задачи есть merge_payload —
+        её аргументы вливаются в ждущую задачу.
+        """
+        transaction.on_commit(lambda: self.create_job(dedupe_key, priority, payload))
+
+    def create_job(self, dedupe_key, priority, payload):
+        # Ждущую задачу могут забрать между вставкой и слиянием,
+        # тогда пробуем вставить ещё раз
+        for _ in range(3):
+            try:
+                with transaction.atomic():
+                    return Job.objects.create(
+                        name=self.name,
+                        payload=payload,
+                        priority=self.priority if priority is None else priority,
+                        max_attempts=self.max_attempts,
+                        dedupe_key=dedupe_key,
+                    )
+            except IntegrityError:
+                if self.merge_payload is None:
+                    return None
+            job_obj = self.merge_into_queued_job(dedupe_key, payload)
+            if job_obj is not None:
+                return job_obj
+        return None
+
+    def merge_into_queued_job(self, dedupe_key, payload):
+        with transaction.atomic():
+            queued = Job.objects.filter(dedupe_key=dedupe_key, status=Job.QUEUED)
+            # Холостой UPDATE сразу берёт блокировку на запись, чтобы
+            # параллельные слияния не затёрли аргументы друг друга
+            if not queued.update(payload=models.F('payload')):
+                return None
+            job_obj = queued.get()
+            job_obj.payload = self.merge_payload(job_obj.payload, payload)
+            job_obj.save(update_fields=['payload'])
+            return job_obj
+
+
+def job(priority=0, max_attempts=3, merge_payload=None):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы передаются только по имени.
+
+    merge_payload(старые, новые) склеивает аргументы задач с одним dedupe_key,
+    пока первая ещё ждёт в очереди
+    """
+    def decorator(func):
+        job_function = JobFunction(
+            func,
+            name=f'{func.__module__}.{func.__name__}',
+            priority=priority,
+            max_attempts=max_attempts,
+            merge_payload=merge_payload,
+        )
+        registry[job_function.name] = job_function
+        return job_function
+
+    return decorator
+
+
+def claim_jobs(worker_name, limit):
+    """Атомарно забирает до limit готовых к запуску задач"""
+    now = timezone.now()
+    claim_token = f'{worker_name}:{uuid.uuid4().hex}'
+    ready_ids = (
+        Job.objects
+        .filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('-priority', 'id')
+        .values('id')[:limit]
+    )
+    claimed = Job.objects.filter(id__in=ready_ids, status=Job.QUEUED).update(
+        status=Job.RUNNING,
+        claimed_by=claim_token,
+        started_at=now,
+        heartbeat_at=now,
+        attempts=models.F('attempts') + 1,
+    )
+    if not claimed:
+        return []
+    return list(Job.objects.filter(claimed_by=claim_token, status=Job.RUNNING))
+
+
+def get_own_job(job_obj):
+    """
+    Задача, пока она числится за этим запуском. Если её уже вернули в очередь
+    и взял другой воркер, обновления через этот запрос ничего не изменят
+    """
+    return Job.objects.filter(id=job_obj.id, claimed_by=job_obj.claimed_by, status=Job.RUNNING)
+
+
+def run_job(job_obj):
+    own_job = get_own_job(job_obj)
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(
+        target=send_heartbeats, args=[own_job, stop_heartbeat], daemon=True)
+    heartbeat.start()
+    try:
+        registry[job_obj.name](**job_obj.payload)
+    except Exception as exception:
+        error = traceback.format_exc()
+        logger.warning('Задача %s #%s упала: %r', job_obj.name, job_obj.id, exception)
+        if job_obj.attempts < job_obj.max_attempts:
+            retry_in = datetime.timedelta(seconds=2 ** job_obj.attempts)
+            requeue_job(own_job, timezone.now() + retry_in, last_error=error)
+        else:
+            own_job.update(
+                status=Job.FAILED,
+                finished_at=timezone.now(),
+                last_error=error,
+            )
+    else:
+        own_job.update(
+            status=Job.DONE,
+            finished_at=timezone.now(),
+        )
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+        close_old_connections()
+
+
+def send_heartbeats(own_job, stop):
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+            own_job.update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def requeue_job(own_job, run_at, **fields):
+    """
+    Возвращает задачу в очередь. Если в очереди уже ждёт задача с тем же
+    dedupe_key, она сделает ту же работу, поэтому эта задача просто закрывается
+    """
+    try:
+        with transaction.atomic():
+            return own_job.update(status=Job.QUEUED, run_at=run_at, **fields)
+    except IntegrityError:
+        own_job.update(status=Job.DONE, finished_at=timezone.now(), **fields)
+        return 0
+
+
+def requeue_stale_jobs():
+    """
+    Возвращает в очередь задачи, которые взял и не доделал упавший воркер.
+    Задачи, исчерпавшие попытки, — например, каждый раз убивающие воркер
+    по памяти, — помечаются упавшими
+    """
+    now = timezone.now()
+    stale_jobs = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - STALE_JOB_TIMEOUT,
+    )
+    requeued = 0
+    for job_obj in list(stale_jobs.only('id', 'claimed_by', 'attempts', 'max_attempts')):
+        # Повторяем условие на пульс: задача могла ожить после выборки
+        own_job = get_own_job(job_obj).filter(heartbeat_at__lt=now - STALE_JOB_TIMEOUT)
+        if job_obj.attempts >= job_obj.max_attempts:
+            own_job.update(
+                status=Job.FAILED,
+                finished_at=now,
+                last_error='Воркер перестал отвечать во время выполнения задачи',
+            )
+        else:
+            requeued += requeue_job(own_job, now)
+    return requeued
+
+
+def prune_jobs(older_than=None):
+    """Удаляет завершённые и упавшие задачи старше JOBS_RETENTION_DAYS"""
+    if older_than is None:
+        older_than = datetime.timedelta(days=settings.JOBS_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        finished_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
+
+
+def get_queue_stats(period=datetime.timedelta(hours=1)):
+    """Глубина очереди и задержки: сколько задачи ждут запуска и выполняются"""
+    now = timezone.now()
+    counts = dict(
+        Job.objects.values('status').annotate(count=models.Count('id'))
+        .values_list('status', 'count')
+    )
+    oldest_queued = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .aggregate(oldest=models.Min('run_at'))['oldest']
+    )
+    recent = Job.objects.filter(status=Job.DONE, finished_at__gte=now - period).aggregate(
+        wait=models.Avg(models.F('started_at') - models.F('created_at')),
+        duration=models.Avg(models.F('finished_at') - models.F('started_at')),
+        done=models.Count('id'),
+    )
+    return {
+        'counts': {status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        'oldest_queued_age': now - oldest_queued if oldest_queued else None,
+        'recent_done': recent['done'],
+        'average_wait': recent['wait'],
+        'average_duration': recent['duration'],
+    }
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.comment_archive import archive_comments, get_archivable_comments, get_table_sizes
+from blog.models import ArchivedComment, Comment
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит старые комментарии к старым постам в архивную таблицу '
+        'и показывает размеры таблиц до и после'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int,
+                            default=settings.COMMENTS_ARCHIVE_AFTER_DAYS,
+                            help='Возраст комментария и поста в днях, после которого он уходит в архив')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько комментариев переносить в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, сколько комментариев уйдёт в архив')
+
+    def handle(self, *args, **options):
+        self.write_sizes('До архивирования')
+        if options['dry_run']:
+            archivable = get_archivable_comments(options['older_than_days']).count()
+            self.stdout.write(f'Будет перенесено комментариев: {archivable}')
+            return
+
+        archived = 0
+        for batch_size in archive_comments(options['older_than_days'], options['batch_size']):
+            archived += batch_size
+            self.stdout.write(f'Перенесено комментариев: {archived}')
+        self.write_sizes('После архивирования')
+
+    def write_sizes(self, title):
+        self.stdout.write(title)
+        for table, (rows, disk_size) in get_table_sizes(Comment, ArchivedComment).items():
+            disk_size = '—' if disk_size is None else f'{disk_size / 1024:.0f} КБ'
+            self.stdout.write(f'  {table}: {rows} строк, {disk_size}')
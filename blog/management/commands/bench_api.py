@@ -0,0 +1,47 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from blog import api
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость отдачи списка постов через JSON API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000,
+                            help='Сколько постов в одном ответе')
+        parser.add_argument('--runs', type=int, default=10,
+                            help='Сколько раз повторить запрос')
+
+    def handle(self, *args, **options):
+        field_sets = {
+            'все поля': None,
+            'id,title,slug': 'id,title,slug',
+            'с тегами и автором': 'id,title,author,tags',
+        }
+        for label, fields in field_sets.items():
+            params = {'limit': options['items']}
+            if fields:
+                params['fields'] = fields
+            self.benchmark(label, params, options['runs'])
+
+    def benchmark(self, label, params, runs):
+        factory = RequestFactory()
+        items = 0
+        size = 0
+        elapsed = 0
+        for _ in range(runs):
+            request = factory.get('/api/posts', params)
+            started_at = time.perf_counter()
+            content = b''.join(api.posts_list(request).streaming_content)
+            elapsed += time.perf_counter() - started_at
+            size += len(content)
+            items += len(json.loads(content)['results'])
+        self.stdout.write(
+            f'{label}: {items / runs:.0f} постов в ответе, '
+            f'{elapsed / runs * 1000:.1f} мс на ответ, '
+            f'{items / elapsed:.0f} постов/с, {size / elapsed / 1024 / 1024:.1f} МБ/с'
+        )
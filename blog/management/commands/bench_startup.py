@@ -0,0 +1,87 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+WORKER_SCRIPT = '''
+import json, sys, time
+started_at = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted_at = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+statuses = []
+response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+b''.join(response)
+finished_at = time.perf_counter()
+
+print(json.dumps({
+    'boot': booted_at - started_at,
+    'first_request': finished_at - booted_at,
+    'status': statuses[0],
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время старта воркера: импорт и настройку Django '
+        'и время ответа на первый запрос для разных профилей настроек'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-modules', nargs='+',
+            default=['sensive_blog.settings', 'sensive_blog.settings_production'],
+            help='Профили настроек, которые нужно сравнить')
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Сколько раз запускать воркер для каждого профиля')
+        parser.add_argument('--url', default='/',
+                            help='Адрес первого запроса')
+
+    def handle(self, *args, **options):
+        for settings_module in options['settings_modules']:
+            runs = [
+                self.run_worker(settings_module, options['url'])
+                for _ in range(options['runs'])
+            ]
+            self.stdout.write(
+                f'{settings_module}: '
+                f'процесс {median_ms(runs, "process")} мс, '
+                f'импорт и настройка {median_ms(runs, "boot")} мс, '
+                f'первый запрос {median_ms(runs, "first_request")} мс '
+                f'(медиана по {len(runs)} запускам, ответ {runs[0]["status"]})'
+            )
+
+    def run_worker(self, settings_module, url):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+        env.setdefault('ALLOWED_HOSTS', 'localhost')
+        started_at = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-c', WORKER_SCRIPT, url],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        process_time = time.perf_counter() - started_at
+        if completed.returncode:
+            raise CommandError(
+                f'Воркер с настройками {settings_module} упал:\n{completed.stderr}'
+            )
+        result = json.loads(completed.stdout.splitlines()[-1])
+        result['process'] = process_time
+        return result
+
+
+def median_ms(runs, key):
+    return round(statistics.median(run[key] for run in runs) * 1000, 1)
@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+from blog.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает похожие посты по TF-IDF заголовков и текстов с учётом тегов. '
+        'По умолчанию пересчитывает только новые и изменённые посты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать похожие посты для всех постов')
+        parser.add_argument('--limit', type=int, default=5,
+                            help='Сколько похожих постов хранить для каждого поста')
+        parser.add_argument('--tag-weight', type=float, default=0.3,
+                            help='Вес близости по тегам от 0 до 1')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Количество процессов')
+        parser.add_argument('--memory-mb', type=int, default=64,
+                            help='Сколько памяти отводить на блок матрицы близостей')
+
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+        post_ids = None
+        if not options['full']:
+            post_ids = list(
+                Post.objects.filter(related_entries__isnull=True)
+                .values_list('id', flat=True)
+            )
+
+        updated = rebuild_related_posts(
+            post_ids,
+            limit=options['limit'],
+            tag_weight=options['tag_weight'],
+            workers=options['workers'],
+            memory_limit_mb=options['memory_mb'],
+        )
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(f'Пересчитано постов: {updated} за {elapsed:.2f} с')
@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from blog.models import Comment, Post, RelatedPost, Tag
+from blog.page_cache import POSTS_LIST_KEY, post_key, tag_key
+from blog.views import POSTS_PER_PAGE, build_common_context, get_common_context_cache_key
+
+
+MANIFEST_NAME = '.freeze-manifest.json'
+SIDEBAR_KEY = 'sidebar'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сохраняет сайт в статические HTML-файлы: главную, посты, теги и контакты. '
+        'Повторный запуск перерисовывает только изменившиеся страницы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Папка для готовых страниц')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Количество процессов для рендеринга')
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Сколько страниц отдавать процессу за раз')
+        parser.add_argument('--full', action='store_true',
+                            help='Перерисовать все страницы, не глядя на прошлую выгрузку')
+
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+
+        manifest = {}
+        if not options['full'] and os.path.exists(manifest_path):
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+
+        cache.delete(get_common_context_cache_key())
+        signatures = get_signatures()
+        urls = get_urls()
+
+        for url in set(manifest) - set(urls):
+            remove_page(output_dir, url)
+            del manifest[url]
+
+        dirty_urls = [
+            url for url in urls
+            if url not in manifest
+            or manifest[url]['digest'] != get_digest(manifest[url]['keys'], signatures)
+            or not os.path.exists(get_page_path(output_dir, url))
+        ]
+
+        connections.close_all()
+        chunk_size = options['chunk_size']
+        chunks = [
+            dirty_urls[start:start + chunk_size]
+            for start in range(0, len(dirty_urls), chunk_size)
+        ]
+        frozen_count = 0
+        failed = {}
+        try:
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+                futures = {
+                    executor.submit(freeze_pages, output_dir, chunk): chunk
+                    for chunk in chunks
+                }
+                for future in as_completed(futures):
+                    try:
+                        frozen, chunk_failed = future.result()
+                    except Exception as error:
+                        # Процесс упал целиком: вся пачка перерисуется в следующий раз
+                        failed.update(dict.fromkeys(futures[future], repr(error)))
+                        continue
+                    failed.update(chunk_failed)
+                    frozen_count += len(frozen)
+                    for url, keys in frozen.items():
+                        manifest[url] = {
+                            'keys': keys,
+                            'digest': get_digest(keys, signatures),
+                        }
+        finally:
+            # Сохраняем то, что успели, даже если выгрузку прервали
+            with open(manifest_path, 'w') as manifest_file:
+                json.dump(manifest, manifest_file)
+
+        for url, error in sorted(failed.items()):
+            self.stderr.write(f'{url}: {error}')
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            f'Страниц всего: {len(urls)}, перерисовано: {frozen_count}, '
+            f'с ошибками: {len(failed)}, время: {elapsed:.2f} с'
+        )
+
+
+def get_urls():
+    posts_count = Post.objects.count()
+    pages_count = Paginator(range(posts_count), POSTS_PER_PAGE).num_pages
+
+    urls = [reverse('index'), reverse('contacts')]
+    urls += [reverse('index', args=[page]) for page in range(2, pages_count + 1)]
+    urls += [
+        reverse('post_detail', args=[slug])
+        for slug in Post.objects.values_list('slug', flat=True).iterator()
+    ]
+    urls += [
+        reverse('tag_filter', args=[title])
+        for title in Tag.objects.values_list('title', flat=True)
+    ]
+    return urls
+
+
+def get_signatures():
+    """Считает отпечатки всего, что может оказаться на странице"""
+    likes_counts = Counter(dict(
+        Post.likes.through.objects.values('post_id')
+        .annotate(count=Count('id')).values_list('post_id', 'count')
+    ))
+    comments_counts = Counter(dict(
+        Comment.objects.values('post_id')
+        .annotate(count=Count('id')).values_list('post_id', 'count')
+    ))
+    post_tags = defaultdict(list)
+    for post_id, tag_id in Post.tags.through.objects.values_list('post_id', 'tag_id').iterator():
+        post_tags[post_id].append(tag_id)
+    # Похожие посты выводятся на странице поста, поэтому входят в его отпечаток
+    related_posts = defaultdict(list)
+    related_entries = RelatedPost.objects.order_by('post_id', '-score', 'related_id')
+    for post_id, related_id in related_entries.values_list('post_id', 'related_id').iterator():
+        related_posts[post_id].append(related_id)
+
+    signatures = {}
+    posts_list_hash = hashlib.sha1()
+    posts = Post.objects.order_by('id').values_list(
+        'id', 'title', 'slug', 'text', 'image', 'published_at', 'author_id',
+        'archived_comments_count')
+    for post in posts.iterator(chunk_size=2000):
+        post_id = post[0]
+        state = (
+            *post, likes_counts[post_id], comments_counts[post_id],
+            sorted(post_tags[post_id]), related_posts[post_id],
+        )
+        signatures[post_key(post_id)] = hash_state(state)
+        posts_list_hash.update(f'{post_id}:{post[5]};'.encode())
+    signatures[POSTS_LIST_KEY] = posts_list_hash.hexdigest()
+
+    tags_counts = Counter(
+        tag_id for tag_ids in post_tags.values() for tag_id in tag_ids
+    )
+    for tag_id, title in Tag.objects.values_list('id', 'title'):
+        signatures[tag_key(tag_id)] = hash_state((title, tags_counts[tag_id]))
+
+    signatures[SIDEBAR_KEY] = hash_state(build_common_context())
+    return signatures
+
+
+def hash_state(state):
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def get_digest(keys, signatures):
+    state = [(key, signatures.get(key)) for key in sorted(keys)]
+    return hash_state(state)
+
+
+def get_page_path(output_dir, url):
+    return os.path.join(output_dir, url.strip('/'), 'index.html')
+
+
+def remove_page(output_dir, url):
+    page_path = get_page_path(output_dir, url)
+    for path in (page_path, f'{page_path}.gz'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_file(path, content):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def freeze_pages(output_dir, urls):
+    """
+    Рендерит страницы в файлы. Возвращает ключи того, что показано на
+    каждой готовой странице, и ошибки страниц, которые не получились
+    """
+    factory = RequestFactory()
+    frozen = {}
+    failed = {}
+    for url in urls:
+        request = factory.get(url)
+        request.user = AnonymousUser()
+        match = resolve(url)
+        view = inspect.unwrap(match.func)
+        try:
+            response = view(request, *match.args, **match.kwargs)
+        except Exception as error:
+            failed[url] = repr(error)
+            continue
+        if response.status_code != 200:
+            failed[url] = f'HTTP {response.status_code}'
+            continue
+
+        page_path = get_page_path(output_dir, url)
+        os.makedirs(os.path.dirname(page_path), exist_ok=True)
+        write_file(page_path, response.content)
+        write_file(f'{page_path}.gz', gzip.compress(response.content, mtime=0))
+
+        keys = getattr(response, 'surrogate_keys', set()) | {SIDEBAR_KEY}
+        frozen[url] = sorted(keys)
+    connections.close_all()
+    return frozen, failed
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from blog.jobs import get_queue_stats
+from blog.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Показывает глубину очереди фоновых задач и задержки за последний час'
+
+    def handle(self, *args, **options):
+        stats = get_queue_stats()
+        statuses = dict(Job.STATUS_CHOICES)
+        for status, count in stats['counts'].items():
+            self.stdout.write(f'{statuses[status]}: {count}')
+        self.stdout.write(f'Самая старая задача ждёт: {format_duration(stats["oldest_queued_age"])}')
+        self.stdout.write(f'Выполнено за час: {stats["recent_done"]}')
+        self.stdout.write(f'Среднее ожидание запуска: {format_duration(stats["average_wait"])}')
+        self.stdout.write(f'Среднее время выполнения: {format_duration(stats["average_duration"])}')
+
+
+def format_duration(duration):
+    if duration is None:
+        return '—'
+    return f'{duration.total_seconds():.2f} с'
@@ -0,0 +1,70 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+import blog.tasks  # noqa: F401 регистрирует задачи
+from blog.jobs import claim_jobs, prune_jobs, requeue_stale_jobs, run_job
+
+# Как часто, в секундах, искать задачи, брошенные упавшими воркерами,
+# и удалять старые завершённые
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер, который выполняет фоновые задачи из очереди в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Сколько задач выполнять одновременно')
+        parser.add_argument('--poll-interval', type=float, default=1,
+                            help='Пауза между проверками пустой очереди в секундах')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить всё, что есть в очереди, и выйти')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stopping.set())
+
+        maintained_at = None
+        free_slots = threading.Semaphore(concurrency)
+        self.stdout.write(f'Воркер {worker_name} запущен, параллельно задач: {concurrency}')
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while not stopping.is_set():
+                close_old_connections()
+                if maintained_at is None or time.monotonic() - maintained_at >= MAINTENANCE_INTERVAL:
+                    requeue_stale_jobs()
+                    prune_jobs()
+                    maintained_at = time.monotonic()
+                slots = self.acquire_free_slots(free_slots, concurrency)
+                jobs = claim_jobs(worker_name, slots)
+                for _ in range(slots - len(jobs)):
+                    free_slots.release()
+
+                for job in jobs:
+                    future = executor.submit(run_job, job)
+                    future.add_done_callback(lambda future: free_slots.release())
+
+                if not jobs:
+                    if options['once'] and slots == concurrency:
+                        break
+                    time.sleep(options['poll_interval'])
+
+        self.stdout.write(f'Воркер {worker_name} остановлен')
+
+    def acquire_free_slots(self, free_slots, concurrency):
+        """Ждёт хотя бы один свободный поток и занимает все свободные"""
+        free_slots.acquire()
+        slots = 1
+        while slots < concurrency and free_slots.acquire(blocking=False):
+            slots += 1
+        return slots
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from blog.models import Post, Tag
+from blog.page_cache import is_cache_shared
+from blog.views import POSTS_PER_PAGE, get_common_context
+
+
+class Command(BaseCommand):
+    help = 'Прогревает кеш: рендерит самые посещаемые страницы через настоящие вьюхи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index-pages', type=int, default=3,
+                            help='Сколько страниц главной прогреть')
+        parser.add_argument('--posts', type=int, default=20,
+                            help='Сколько самых популярных и самых читаемых постов прогреть')
+        parser.add_argument('--tags', type=int, default=10,
+                            help='Сколько самых популярных тегов прогреть')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Количество потоков для рендеринга')
+        parser.add_argument('--budget', type=float, default=30,
+                            help='Лимит времени на прогрев в секундах')
+
+    def handle(self, *args, **options):
+        if not is_cache_shared():
+            raise CommandError(
+                'Кеш хранится в памяти процесса и пропадёт вместе с командой. '
+                'Укажите общий CACHE_BACKEND, например FileBasedCache'
+            )
+        started_at = time.monotonic()
+
+        # Общий контекст нужен каждой странице: считаем его один раз заранее,
+        # чтобы потоки не пересчитывали одни и те же агрегаты одновременно
+        get_common_context()
+
+        urls = self.get_hot_urls(
+            options['index_pages'], options['posts'], options['tags'])
+
+        pending_urls = queue.SimpleQueue()
+        for url in urls:
+            pending_urls.put(url)
+        deadline = started_at + options['budget']
+        errors = {}
+        rendered = []
+
+        def render_until_deadline():
+            # Новую страницу берём, только пока не вышло время: после лимита
+            # потоки дорендеривают уже начатые страницы и завершаются
+            while time.monotonic() < deadline:
+                try:
+                    url = pending_urls.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    render_url(url)
+                except Exception as error:
+                    errors[url] = error
+                rendered.append(url)
+
+        threads = [
+            threading.Thread(target=render_until_deadline)
+            for _ in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for url, error in errors.items():
+            self.stderr.write(f'{url}: {error!r}')
+        warmed = len(rendered) - len(errors)
+        skipped = len(urls) - len(rendered)
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            f'Прогрето страниц: {warmed} из {len(urls)} за {elapsed:.2f} с'
+        )
+        if skipped:
+            self.stdout.write(
+                f'Не уложились в лимит времени: {skipped} страниц пропущено'
+            )
+
+    def get_hot_urls(self, index_pages, posts_limit, tags_limit):
+        posts_count = Post.objects.count()
+        last_page = max((posts_count - 1) // POSTS_PER_PAGE + 1, 1)
+
+        urls = [reverse('index')]
+        urls += [
+            reverse('index', args=[page])
+            for page in range(2, min(index_pages, last_page) + 1)
+        ]
+        hot_slugs = dict.fromkeys([
+            *Post.objects.trending().values_list('slug', flat=True)[:posts_limit],
+            *Post.objects.popular().values_list('slug', flat=True)[:posts_limit],
+        ])
+        urls += [reverse('post_detail', args=[slug]) for slug in hot_slugs]
+        urls += [
+            reverse('tag_filter', args=[title])
+            for title in Tag.objects.popular().values_list('title', flat=True)[:tags_limit]
+        ]
+        return urls
+
+
+def render_url(url):
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    request.skip_view_counting = True
+    match = resolve(url)
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    finally:
+        connection.close()
+    if response.status_code != 200:
+        raise ValueError(f'HTTP {response.status_code}')
+    return response
@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def make_slugs_unique(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    duplicated_slugs = (
+        Post.objects.values('slug')
+        .annotate(posts_count=models.Count('id'))
+        .filter(posts_count__gt=1)
+        .values_list('slug', flat=True)
+    )
+    for slug in list(duplicated_slugs):
+        posts = Post.objects.filter(slug=slug).order_by('id')
+        for post in posts[1:]:
+            post.slug = get_free_slug(Post, f'{slug[:180]}-{post.id}')
+            post.save(update_fields=['slug'])
+
+
+def get_free_slug(Post, slug):
+    candidate = slug
+    number = 2
+    while Post.objects.filter(slug=candidate).exists():
+        candidate = f'{slug}-{number}'
+        number += 1
+    return candidate
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_alter_comment_post'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_slugs_unique, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.SlugField(max_length=200, unique=True, verbose_name='Название в виде url'),
+        ),
+        migrations.CreateModel(
+            name='PostSlugHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=200, unique=True, verbose_name='Прежнее название в виде url')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Когда изменено')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='old_slugs', to='blog.post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'прежний адрес поста',
+                'verbose_name_plural': 'прежние адреса постов',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+def start_heartbeats(apps, schema_editor):
+    Job = apps.get_model('blog', 'Job')
+    Job.objects.filter(status='running').update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_archived_comments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний пульс'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='blog_job_status_8a192a_idx'),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+import datetime
+
 from django.db import models
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 
@@ -22,7 +25,10 @@ class PostQuerySet(models.QuerySet):
     def with_comments_and_likes_count(self):
         """Возвращает посты с аннотированными количествами комментариев и лайков"""
         return self.annotate(
-            comments_count=models.Count('comments', distinct=True),
+            comments_count=(
+                models.Count('comments', distinct=True)
+                + models.F('archived_comments_count')
+            ),
             likes_count=models.Count('likes', distinct=True)
         )
 
@@ -43,7 +49,7 @@ class PostQuerySet(models.QuerySet):
         from django.db.models import Count
         comments_counts = (
             Post.objects.filter(id__in=[post.id for post in posts])
-            .annotate(comments_count=Count('comments'))
+            .annotate(comments_count=Count('comments') + models.F('archived_comments_count'))
             .values('id', 'comments_count')
         )
         
@@ -74,6 +80,26 @@ class PostQuerySet(models.QuerySet):
             .distinct()[:limit]
         )
 
+    def trending(self, days=7):
+        """Возвращает посты, отсортированные по просмотрам за последние дни"""
+        since = timezone.localdate() - datetime.timedelta(days=days)
+        return self.annotate(
+            recent_views=models.Sum(
+                'daily_views__views',
+                filter=models.Q(daily_views__date__gt=since),
+            )
+        ).filter(recent_views__gt=0).order_by('-recent_views')
+
+    def related(self, post, limit=5):
+        """
+        Возвращает похожие посты из таблицы RelatedPost,
+        которую заполняет команда build_related_posts
+        """
+        return (
+            self.filter(related_from__post=post)
+            .order_by('-related_from__score')[:limit]
+        )
+
 class TagQuerySet(models.QuerySet):
     def popular(self):
         return self.annotate(posts_count=models.Count('posts')).order_by('-posts_count')
@@ -86,9 +112,12 @@ class TagQuerySet(models.QuerySet):
 class Post(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     text = models.TextField('Текст')
-    slug = models.SlugField('Название в виде url', max_length=200)
+    slug = models.SlugField('Название в виде url', max_length=200, unique=True)
     image = models.ImageField('Картинка')
     published_at = models.DateTimeField('Дата и время публикации')
+    views_count = models.PositiveIntegerField('Просмотры', default=0, editable=False)
+    archived_comments_count = models.PositiveIntegerField(
+        'Комментариев в архиве', default=0, editable=False)
 
     author = models.ForeignKey(
         User,
@@ -112,6 +141,10 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['-published_at']
+        indexes = [
+            models.Index(fields=['published_at']),
+            models.Index(fields=['author', 'published_at']),
+        ]
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
 
@@ -159,5 +192,164 @@ class Comment(models.Model):
         ordering = ['published_at']
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
-        
 
+
+class ArchivedComment(models.Model):
+    """
+    Старый комментарий, перенесённый командой archive_comments.
+    id совпадает с id исходного комментария
+    """
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='Пост, к которому написан'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+
+    text = models.TextField('Текст комментария')
+    published_at = models.DateTimeField('Дата и время публикации')
+    archived_at = models.DateTimeField('Когда перенесён в архив', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.author.username} under {self.post.title}'
+
+    class Meta:
+        ordering = ['published_at']
+        verbose_name = 'архивный комментарий'
+        verbose_name_plural = 'архивные комментарии'
+
+
+class ArchiveMonth(models.Model):
+    year = models.PositiveSmallIntegerField('Год')
+    month = models.PositiveSmallIntegerField('Месяц')
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02}: {self.posts_count}'
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='unique_archive_month'),
+        ]
+        verbose_name = 'месяц архива'
+        verbose_name_plural = 'месяцы архива'
+
+
+class PostSlugHistory(models.Model):
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='old_slugs',
+        verbose_name='Пост'
+    )
+    slug = models.SlugField('Прежнее название в виде url', max_length=200, unique=True)
+    changed_at = models.DateTimeField('Когда изменено', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.slug} → {self.post.slug}'
+
+    class Meta:
+        verbose_name = 'прежний адрес поста'
+        verbose_name_plural = 'прежние адреса постов'
+
+
+class RelatedPost(models.Model):
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='related_entries',
+        verbose_name='Пост'
+    )
+    related = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='related_from',
+        verbose_name='Похожий пост'
+    )
+    score = models.FloatField('Схожесть')
+
+    def __str__(self):
+        return f'{self.post_id} → {self.related_id}: {self.score:.3f}'
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['post', '-score']),
+        ]
+        verbose_name = 'похожий пост'
+        verbose_name_plural = 'похожие посты'
+
+
+class PostDailyViews(models.Model):
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='daily_views',
+        verbose_name='Пост'
+    )
+    date = models.DateField('День')
+    views = models.PositiveIntegerField('Просмотры', default=0)
+
+    def __str__(self):
+        return f'{self.post_id} {self.date}: {self.views}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'date'], name='unique_post_daily_views'),
+        ]
+        ordering = ['-date']
+        verbose_name = 'просмотры за день'
+        verbose_name_plural = 'просмотры по дням'
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.JSONField('Аргументы', default=dict)
+    priority = models.IntegerField('Приоритет', default=0)
+    status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    dedupe_key = models.CharField('Ключ для склейки дублей', max_length=200, blank=True, null=True)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Максимум попыток', default=3)
+    claimed_by = models.CharField('Кем взята', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    run_at = models.DateTimeField('Запустить не раньше', default=timezone.now)
+    started_at = models.DateTimeField('Начата', null=True, blank=True)
+    heartbeat_at = models.DateTimeField('Последний пульс', null=True, blank=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at']),
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status='queued'),
+                name='unique_active_job_dedupe_key',
+            ),
+        ]
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'фоновые задачи'
@@ -0,0 +1,157 @@
+"""
+Кеш целых страниц для анонимных посетителей.
+
+Каждая закешированная страница помечена суррогатными ключами — идентификаторами
+постов и тегов, которые на ней показаны. У каждого ключа в кеше хранится версия.
+Сбросить ключ — значит выдать ему новую версию: страницы, сохранённые со
+старой версией, перестают считаться актуальными. Так сбрасываются только те
+страницы, где встречается изменившийся пост или тег, а воркерам не нужно
+договариваться между собой о списках страниц.
+"""
+import hashlib
+import urllib.request
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+PAGE_CACHE_TIMEOUT = 5 * 60
+POSTS_LIST_KEY = 'posts'
+# Помесячный архив в сайдбаре: меняется, только когда меняется число постов за месяц
+ARCHIVE_KEY = 'archive'
+# Версия всего содержимого сайта: меняется при любом сбросе
+CONTENT_KEY = 'content'
+
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_cache_shared():
+    """Общий ли кеш для всех процессов: без этого сброс не доходит до других воркеров"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def post_key(post_id):
+    return f'post-{post_id}'
+
+
+def tag_key(tag_id):
+    return f'tag-{tag_id}'
+
+
+def get_posts_surrogate_keys(posts):
+    """Ключи постов и их тегов. Теги должны быть предзагружены"""
+    keys = set()
+    for post in posts:
+        keys.add(post_key(post.id))
+        keys.update(tag_key(tag.id) for tag in post.tags.all())
+    return keys
+
+
+def get_serialized_surrogate_keys(serialized_posts=(), serialized_tags=()):
+    """Ключи для уже сериализованных постов и тегов, например из общего контекста"""
+    keys = set()
+    for post in serialized_posts:
+        keys.add(post_key(post['id']))
+        keys.update(tag_key(tag['id']) for tag in post['tags'])
+    keys.update(tag_key(tag['id']) for tag in serialized_tags)
+    return keys
+
+
+def get_versions(keys):
+    version_keys = {f'surrogate:{key}': key for key in keys}
+    versions = cache.get_many(version_keys)
+    missing = {
+        version_key: uuid.uuid4().hex
+        for version_key in version_keys
+        if version_key not in versions
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return {version_keys[version_key]: version for version_key, version in versions.items()}
+
+
+def bump_versions(*keys):
+    """Выдаёт ключам новые версии, не трогая фронтовой прокси"""
+    cache.set_many(
+        {f'surrogate:{key}': uuid.uuid4().hex for key in keys},
+        timeout=None,
+    )
+
+
+def purge(*keys):
+    """Сбрасывает все страницы, помеченные хотя бы одним из ключей"""
+    if not keys:
+        return
+    bump_versions(*keys, CONTENT_KEY)
+    if getattr(settings, 'SURROGATE_PURGE_URL', ''):
+        from blog.tasks import PURGE_PROXY_DEDUPE_KEY, purge_proxy_pages
+        # Пока задача ждёт воркера, новые ключи копятся в ней же
+        purge_proxy_pages.enqueue(dedupe_key=PURGE_PROXY_DEDUPE_KEY, keys=sorted(keys))
+
+
+def purge_proxy(keys):
+    """Просит фронтовой прокси сбросить страницы с этими ключами"""
+    request = urllib.request.Request(
+        settings.SURROGATE_PURGE_URL,
+        method='PURGE',
+        headers={'Surrogate-Key': ' '.join(sorted(keys))},
+    )
+    urllib.request.urlopen(request, timeout=5).close()
+
+
+def get_page_cache_key(request):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path_hash}'
+
+
+def add_surrogate_headers(response, keys):
+    response['Surrogate-Key'] = ' '.join(sorted(keys))
+    patch_cache_control(response, public=True, max_age=0, s_maxage=PAGE_CACHE_TIMEOUT)
+    patch_vary_headers(response, ['Cookie'])
+
+
+def cache_anonymous_page(view):
+    """
+    Кеширует ответ вьюхи для анонимных GET и HEAD запросов.
+
+    Вьюха сообщает, что показано на странице, через атрибут ответа
+    `surrogate_keys`. Ответы без него не кешируются.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        cache_key = get_page_cache_key(request)
+        entry = cache.get(cache_key)
+        if entry and get_versions(entry['versions']) == entry['versions']:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            add_surrogate_headers(response, entry['versions'])
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        response = view(request, *args, **kwargs)
+        keys = getattr(response, 'surrogate_keys', None)
+        if response.status_code != 200 or keys is None:
+            return response
+
+        # Версии читаются уже после рендеринга. Если пост поменяется прямо
+        # во время рендеринга, страница устареет не дольше чем на PAGE_CACHE_TIMEOUT
+        cache.set(cache_key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'versions': get_versions(keys),
+        }, PAGE_CACHE_TIMEOUT)
+        add_surrogate_headers(response, keys)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return wrapper
@@ -0,0 +1,177 @@
+"""
+Похожие посты по содержанию.
+
+Заголовки и тексты постов превращаются в TF-IDF векторы (разреженные матрицы
+SciPy), косинусная близость считается блоками строк, чтобы матрица близостей
+не занимала больше заданного объёма памяти. К близости текстов подмешивается
+близость по тегам. Лучшие соседи каждого поста сохраняются в RelatedPost.
+"""
+import math
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import connections, transaction
+from scipy import sparse
+
+from blog import page_cache
+from blog.models import Post, RelatedPost
+
+
+TOKEN_RE = re.compile(r'\w{2,}')
+TITLE_WEIGHT = 2
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def build_tfidf_matrix(documents):
+    """Строит L2-нормированную TF-IDF матрицу по спискам токенов"""
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    data = []
+    for tokens in documents:
+        counts = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        indices.extend(counts.keys())
+        data.extend(1 + math.log(count) for count in counts.values())
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), indices, indptr),
+        shape=(len(documents), len(vocabulary)),
+    )
+    documents_with_term = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(documents)) / (1 + documents_with_term)) + 1
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+    return normalize_rows(matrix)
+
+
+def build_tags_matrix(post_ids, post_tags):
+    rows, columns = [], []
+    tag_columns = {}
+    for row, post_id in enumerate(post_ids):
+        for tag_id in post_tags.get(post_id, ()):
+            rows.append(row)
+            columns.append(tag_columns.setdefault(tag_id, len(tag_columns)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(post_ids), max(len(tag_columns), 1)),
+    )
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+
+
+def load_corpus():
+    posts = Post.objects.order_by('id').values_list('id', 'title', 'text')
+    post_ids = []
+    documents = []
+    for post_id, title, text in posts.iterator(chunk_size=2000):
+        post_ids.append(post_id)
+        documents.append(tokenize(title) * TITLE_WEIGHT + tokenize(text))
+
+    post_tags = {}
+    tags = Post.tags.through.objects.values_list('post_id', 'tag_id')
+    for post_id, tag_id in tags.iterator(chunk_size=10000):
+        post_tags.setdefault(post_id, []).append(tag_id)
+    return post_ids, documents, post_tags
+
+
+_worker_state = {}
+
+
+def init_worker(texts, tags, tag_weight, limit):
+    _worker_state.update(texts=texts, tags=tags, tag_weight=tag_weight, limit=limit)
+
+
+def find_neighbours(rows):
+    """Возвращает лучших соседей для блока строк матрицы"""
+    texts = _worker_state['texts']
+    tags = _worker_state['tags']
+    tag_weight = _worker_state['tag_weight']
+    limit = min(_worker_state['limit'], texts.shape[0] - 1)
+
+    rows = np.asarray(rows)
+    scores = (1 - tag_weight) * (texts[rows] @ texts.T).toarray()
+    scores += tag_weight * (tags[rows] @ tags.T).toarray()
+    scores[np.arange(len(rows)), rows] = -np.inf
+
+    if limit <= 0:
+        return rows, np.empty((len(rows), 0), dtype=int), np.empty((len(rows), 0))
+    best = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return (
+        rows,
+        np.take_along_axis(best, order, axis=1),
+        np.take_along_axis(best_scores, order, axis=1),
+    )
+
+
+def rebuild_related_posts(post_ids_to_update=None, limit=5, tag_weight=0.3,
+                          workers=None, memory_limit_mb=64):
+    """
+    Пересчитывает похожие посты.
+
+    Без post_ids_to_update пересчитывает все посты, иначе только указанные,
+    но соседей всё равно ищет среди всех постов. Возвращает число
+    пересчитанных постов.
+    """
+    post_ids, documents, post_tags = load_corpus()
+    if not post_ids:
+        return 0
+    texts = build_tfidf_matrix(documents)
+    tags = build_tags_matrix(post_ids, post_tags)
+
+    row_by_post_id = {post_id: row for row, post_id in enumerate(post_ids)}
+    if post_ids_to_update is None:
+        rows_to_update = list(range(len(post_ids)))
+    else:
+        rows_to_update = [
+            row_by_post_id[post_id] for post_id in post_ids_to_update
+            if post_id in row_by_post_id
+        ]
+
+    # Блок близостей — плотная матрица float32 размером block_size × число постов
+    block_size = max(1, memory_limit_mb * 1024 * 1024 // (4 * len(post_ids) * 2))
+    blocks = [
+        rows_to_update[start:start + block_size]
+        for start in range(0, len(rows_to_update), block_size)
+    ]
+
+    if workers == 1:
+        init_worker(texts, tags, tag_weight, limit)
+        for block in blocks:
+            save_neighbours(post_ids, *find_neighbours(block))
+        return len(rows_to_update)
+
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(texts, tags, tag_weight, limit),
+    ) as executor:
+        for rows, neighbours, scores in executor.map(find_neighbours, blocks):
+            save_neighbours(post_ids, rows, neighbours, scores)
+    return len(rows_to_update)
+
+
+def save_neighbours(post_ids, rows, neighbours, scores):
+    block_post_ids = [post_ids[row] for row in rows]
+    entries = [
+        RelatedPost(post_id=post_ids[row], related_id=post_ids[neighbour], score=float(score))
+        for row, row_neighbours, row_scores in zip(rows, neighbours, scores)
+        for neighbour, score in zip(row_neighbours, row_scores)
+        if score > 0
+    ]
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=block_post_ids).delete()
+        RelatedPost.objects.bulk_create(entries, batch_size=1000)
+    page_cache.purge(*[page_cache.post_key(post_id) for post_id in block_post_ids])
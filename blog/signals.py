@@ -0,0 +1,109 @@
+from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from blog import page_cache
+from blog.archive import get_month, recount_months
+from blog.models import ArchivedComment, Comment, Post, PostSlugHistory, RelatedPost, Tag
+from blog.slugs import forget_slug
+from blog.tasks import update_related_posts
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, **kwargs):
+    old_post = Post.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._content_changed = old_post is not None and (
+        (old_post.title, old_post.text) != (instance.title, instance.text)
+    )
+    instance._old_published_at = old_post.published_at if old_post is not None else None
+    instance._old_slug = (
+        old_post.slug if old_post is not None and old_post.slug != instance.slug else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    page_cache.purge(page_cache.post_key(instance.id), page_cache.POSTS_LIST_KEY)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def recount_archive_months(sender, instance, **kwargs):
+    months = [get_month(instance.published_at)]
+    old_published_at = getattr(instance, '_old_published_at', None)
+    if old_published_at is not None:
+        months.append(get_month(old_published_at))
+    if recount_months(months):
+        page_cache.purge(page_cache.ARCHIVE_KEY)
+
+
+@receiver(post_save, sender=Post)
+def remember_old_slug(sender, instance, **kwargs):
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug:
+        PostSlugHistory.objects.update_or_create(slug=old_slug, defaults={'post': instance})
+        forget_slug(old_slug)
+
+
+@receiver(post_save, sender=Post)
+def reset_related_posts(sender, instance, **kwargs):
+    # Пока фоновая задача не пересчитает похожие посты,
+    # post_detail покажет похожие по тегам
+    if kwargs['created'] or getattr(instance, '_content_changed', False):
+        RelatedPost.objects.filter(post=instance).delete()
+        update_related_posts.enqueue(dedupe_key='update_related_posts')
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post_slug(sender, instance, **kwargs):
+    forget_slug(instance.slug)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def purge_commented_post_pages(sender, instance, **kwargs):
+    page_cache.purge(page_cache.post_key(instance.post_id))
+
+
+@receiver(post_delete, sender=ArchivedComment)
+def forget_archived_comment(sender, instance, **kwargs):
+    # Архивные комментарии удаляются каскадом вместе с постом или автором
+    Post.objects.filter(id=instance.post_id).update(
+        archived_comments_count=models.F('archived_comments_count') - 1)
+    page_cache.purge(page_cache.post_key(instance.post_id))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def purge_tag_pages(sender, instance, **kwargs):
+    page_cache.purge(page_cache.tag_key(instance.id))
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def purge_liked_post_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        post_ids = [instance.id]
+    elif action == 'pre_clear':
+        post_ids = list(instance.liked_posts.values_list('id', flat=True))
+    else:
+        post_ids = list(pk_set)
+    page_cache.purge(*[page_cache.post_key(post_id) for post_id in post_ids])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_tagged_post_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if action == 'pre_clear':
+        related = instance.posts if reverse else instance.tags
+        pk_set = related.values_list('id', flat=True)
+
+    if reverse:
+        post_ids, tag_ids = list(pk_set), [instance.id]
+    else:
+        post_ids, tag_ids = [instance.id], list(pk_set)
+    page_cache.purge(
+        *[page_cache.post_key(post_id) for post_id in post_ids],
+        *[page_cache.tag_key(tag_id) for tag_id in tag_ids],
+    )
+    RelatedPost.objects.filter(post_id__in=post_ids).delete()
+    update_related_posts.enqueue(dedupe_key='update_related_posts')
@@ -0,0 +1,82 @@
+"""
+Поиск поста по slug.
+
+Перед запросом к БД slug переводится в id поста через небольшой LRU-кеш
+внутри процесса и общий кеш Django. Записи в кешах могут устареть в других
+воркерах, поэтому найденный по id пост сверяется со slug из адреса: при
+расхождении запись выбрасывается и пост ищется заново.
+"""
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+
+LOCAL_CACHE_SIZE = 1024
+SLUG_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+local_cache = LRUCache(LOCAL_CACHE_SIZE)
+
+
+def get_cache_key(slug):
+    return f'slug:{slug}'
+
+
+def get_cached_post_id(slug):
+    post_id = local_cache.get(slug)
+    if post_id is None:
+        post_id = cache.get(get_cache_key(slug))
+        if post_id is not None:
+            local_cache.set(slug, post_id)
+    return post_id
+
+
+def remember_slug(slug, post_id):
+    local_cache.set(slug, post_id)
+    cache.set(get_cache_key(slug), post_id, SLUG_CACHE_TIMEOUT)
+
+
+def forget_slug(slug):
+    local_cache.delete(slug)
+    cache.delete(get_cache_key(slug))
+
+
+def get_post_by_slug(queryset, slug):
+    """Возвращает пост из queryset по текущему slug или None"""
+    post_id = get_cached_post_id(slug)
+    if post_id is not None:
+        post = queryset.filter(id=post_id).first()
+        if post is not None and post.slug == slug:
+            return post
+        forget_slug(slug)
+
+    post = queryset.filter(slug=slug).first()
+    if post is not None:
+        remember_slug(slug, post.id)
+    return post
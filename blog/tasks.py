@@ -0,0 +1,28 @@
+from blog import page_cache
+from blog.jobs import job
+from blog.models import Post
+
+
+PURGE_PROXY_DEDUPE_KEY = 'purge_proxy_pages'
+
+
+def merge_purged_keys(queued_payload, payload):
+    return {'keys': sorted({*queued_payload['keys'], *payload['keys']})}
+
+
+@job(priority=10, max_attempts=5, merge_payload=merge_purged_keys)
+def purge_proxy_pages(keys):
+    """Сбрасывает страницы во фронтовом прокси"""
+    page_cache.purge_proxy(keys)
+
+
+@job(priority=0)
+def update_related_posts():
+    """Пересчитывает похожие посты для новых и изменённых постов"""
+    from blog.related import rebuild_related_posts
+
+    post_ids = list(
+        Post.objects.filter(related_entries__isnull=True).values_list('id', flat=True)
+    )
+    if post_ids:
+        rebuild_related_posts(post_ids, workers=1)
@@ -0,0 +1,12 @@
+from django import template
+
+from blog.fragment_cache import render_post_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, variant):
+    """Выводит карточки постов из общего кеша фрагментов"""
+    return render_post_cards(posts, variant)
@@ -0,0 +1,176 @@
+import datetime
+import threading
+
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from blog.jobs import STALE_JOB_TIMEOUT, claim_jobs, job, prune_jobs, requeue_stale_jobs, run_job
+from blog.models import Job
+
+
+calls = []
+
+
+@job(max_attempts=2)
+def record_call(value):
+    calls.append(value)
+
+
+@job(merge_payload=lambda queued, new: {'values': queued['values'] + new['values']})
+def record_values(values):
+    calls.extend(values)
+
+
+@job(max_attempts=2)
+def always_fail():
+    raise RuntimeError('boom')
+
+
+class ClaimJobsTests(TransactionTestCase):
+    def test_concurrent_claimers_never_take_the_same_job(self):
+        jobs = Job.objects.bulk_create(
+            [Job(name=record_call.name, payload={'value': number}) for number in range(60)])
+        claimed = {'first': [], 'second': []}
+        start = threading.Barrier(2)
+
+        def claim(worker_name):
+            start.wait()
+            while True:
+                batch = claim_jobs(worker_name, limit=5)
+                if not batch:
+                    return
+                claimed[worker_name] += [job_obj.id for job_obj in batch]
+
+        threads = [threading.Thread(target=claim, args=[name]) for name in claimed]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_claimed = claimed['first'] + claimed['second']
+        self.assertEqual(sorted(all_claimed), sorted(job_obj.id for job_obj in jobs))
+        self.assertEqual(len(all_claimed), len(set(all_claimed)))
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+
+class JobDedupeAndRetryTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def enqueue(self, job_function, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            job_function.enqueue(**kwargs)
+
+    def claim_one(self):
+        job_obj, = claim_jobs('test', limit=1)
+        return job_obj
+
+    def test_enqueue_skips_duplicate_of_queued_job(self):
+        self.enqueue(record_call, dedupe_key='same', value=1)
+        self.enqueue(record_call, dedupe_key='same', value=2)
+
+        self.assertEqual(Job.objects.filter(dedupe_key='same').count(), 1)
+
+    def test_running_job_does_not_block_new_duplicate(self):
+        self.enqueue(record_call, dedupe_key='same', value=1)
+        self.claim_one()
+        self.enqueue(record_call, dedupe_key='same', value=2)
+
+        self.assertEqual(Job.objects.filter(dedupe_key='same', status=Job.QUEUED).count(), 1)
+
+    def test_enqueue_merges_payload_into_queued_job(self):
+        self.enqueue(record_values, dedupe_key='same', values=[1])
+        self.enqueue(record_values, dedupe_key='same', values=[2])
+
+        self.assertEqual(Job.objects.get().payload, {'values': [1, 2]})
+
+    def test_enqueue_does_not_merge_into_running_job(self):
+        self.enqueue(record_values, dedupe_key='same', values=[1])
+        running = self.claim_one()
+        self.enqueue(record_values, dedupe_key='same', values=[2])
+
+        running.refresh_from_db()
+        self.assertEqual(running.payload, {'values': [1]})
+        self.assertEqual(Job.objects.get(status=Job.QUEUED).payload, {'values': [2]})
+
+    def test_failed_job_is_retried_later(self):
+        self.enqueue(always_fail)
+        run_job(self.claim_one())
+
+        job_obj = Job.objects.get()
+        self.assertEqual(job_obj.status, Job.QUEUED)
+        self.assertGreater(job_obj.run_at, timezone.now())
+        self.assertIn('boom', job_obj.last_error)
+
+    def test_failed_job_gives_up_after_max_attempts(self):
+        self.enqueue(always_fail)
+        run_job(self.claim_one())
+        Job.objects.update(run_at=timezone.now())
+        run_job(self.claim_one())
+
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_retry_folds_into_queued_duplicate(self):
+        self.enqueue(always_fail, dedupe_key='same')
+        running = self.claim_one()
+        self.enqueue(always_fail, dedupe_key='same')
+
+        run_job(running)
+
+        running.refresh_from_db()
+        self.assertEqual(running.status, Job.DONE)
+        self.assertEqual(Job.objects.filter(dedupe_key='same', status=Job.QUEUED).count(), 1)
+
+    def test_stale_jobs_are_requeued_or_folded(self):
+        silent_since = timezone.now() - STALE_JOB_TIMEOUT - datetime.timedelta(minutes=1)
+        first, second = Job.objects.bulk_create([
+            Job(name=record_call.name, dedupe_key='same', status=Job.RUNNING,
+                attempts=1, heartbeat_at=silent_since),
+            Job(name=record_call.name, dedupe_key='same', status=Job.RUNNING,
+                attempts=1, heartbeat_at=silent_since),
+        ])
+        long_running = Job.objects.create(
+            name=record_call.name, status=Job.RUNNING, attempts=1,
+            started_at=silent_since, heartbeat_at=timezone.now())
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual(sorted([statuses[first.id], statuses[second.id]]), [Job.DONE, Job.QUEUED])
+        self.assertEqual(statuses[long_running.id], Job.RUNNING)
+
+    def test_stale_job_without_attempts_left_fails(self):
+        silent_since = timezone.now() - STALE_JOB_TIMEOUT - datetime.timedelta(minutes=1)
+        job_obj = Job.objects.create(
+            name=record_call.name, status=Job.RUNNING,
+            attempts=2, max_attempts=2, heartbeat_at=silent_since)
+
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+        job_obj.refresh_from_db()
+        self.assertEqual(job_obj.status, Job.FAILED)
+
+    def test_prune_deletes_only_old_finished_jobs(self):
+        long_ago = timezone.now() - datetime.timedelta(days=30)
+        Job.objects.bulk_create([
+            Job(name=record_call.name, status=Job.DONE, finished_at=long_ago),
+            Job(name=record_call.name, status=Job.FAILED, finished_at=long_ago),
+            Job(name=record_call.name, status=Job.DONE, finished_at=timezone.now()),
+            Job(name=record_call.name, status=Job.QUEUED),
+        ])
+
+        self.assertEqual(prune_jobs(datetime.timedelta(days=7)), 2)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_finished_run_does_not_touch_job_taken_by_another_worker(self):
+        self.enqueue(record_call, value=1)
+        first_run = self.claim_one()
+        Job.objects.update(status=Job.QUEUED)
+        second_run = self.claim_one()
+
+        run_job(first_run)
+
+        second_run.refresh_from_db()
+        self.assertEqual(second_run.status, Job.RUNNING)
+        self.assertEqual(calls, [1])
+
@@ -0,0 +1,91 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from blog import page_cache
+from blog.jobs import claim_jobs, run_job
+from blog.models import Job
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+        @page_cache.cache_anonymous_page
+        def view(request):
+            self.renders += 1
+            response = HttpResponse(f'render {self.renders}')
+            response.surrogate_keys = {page_cache.post_key(1), page_cache.tag_key(1)}
+            return response
+
+        self.view = view
+
+    def get(self):
+        request = RequestFactory().get('/page')
+        request.user = AnonymousUser()
+        return self.view(request)
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        response = self.get()
+
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(response['Surrogate-Key'], 'post-1 tag-1')
+
+    def test_purge_of_unrelated_key_keeps_page(self):
+        self.get()
+        page_cache.purge(page_cache.post_key(2))
+
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+
+    def test_purge_of_any_page_key_drops_page(self):
+        for key in [page_cache.post_key(1), page_cache.tag_key(1)]:
+            self.get()
+            page_cache.purge(key)
+            response = self.get()
+
+            self.assertEqual(response['X-Page-Cache'], 'miss')
+            self.assertEqual(response.content, f'render {self.renders}'.encode())
+
+
+class ProxyPurgeTests(TestCase):
+    """Сброс в прокси проверяется на локальном HTTP-сервере вместо Varnish"""
+
+    def setUp(self):
+        cache.clear()
+        self.proxy_requests = []
+        proxy_requests = self.proxy_requests
+
+        class ProxyHandler(BaseHTTPRequestHandler):
+            def do_PURGE(self):
+                proxy_requests.append((self.command, self.path, self.headers['Surrogate-Key']))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ProxyHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.proxy_url = f'http://127.0.0.1:{server.server_port}/varnish'
+
+    def test_purges_are_sent_to_proxy_as_one_request(self):
+        with override_settings(SURROGATE_PURGE_URL=self.proxy_url):
+            with self.captureOnCommitCallbacks(execute=True):
+                page_cache.purge(page_cache.post_key(1), page_cache.tag_key(2))
+            with self.captureOnCommitCallbacks(execute=True):
+                page_cache.purge(page_cache.post_key(3))
+
+            job_obj, = claim_jobs('test', limit=5)
+            run_job(job_obj)
+
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        self.assertEqual(self.proxy_requests, [('PURGE', '/varnish', 'post-1 post-3 tag-2')])
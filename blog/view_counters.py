@@ -0,0 +1,151 @@
+"""
+Счётчики просмотров постов.
+
+На пути запроса просмотр только увеличивает счётчик в памяти процесса.
+Фоновый поток раз в VIEWS_FLUSH_INTERVAL секунд забирает накопленные
+просмотры и записывает их в БД одним UPDATE для постов и одним для
+дневной статистики. Если воркер упадёт, потеряются только просмотры
+за последний интервал.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from blog.models import Post, PostDailyViews
+
+
+logger = logging.getLogger(__name__)
+
+_pending_views = Counter()
+_lock = threading.Lock()
+_flusher_pid = None
+
+
+def record_view(slug):
+    # Дата берётся в момент просмотра: просмотры перед полуночью
+    # попадают в свой день, даже если запишутся уже после неё
+    viewed_on = timezone.localdate()
+    with _lock:
+        _pending_views[slug, viewed_on] += 1
+    ensure_flusher()
+
+
+def ensure_flusher():
+    """Запускает фоновый поток в текущем процессе, в том числе после fork"""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=run_flusher, name='views-flusher', daemon=True).start()
+
+
+def run_flusher():
+    while True:
+        time.sleep(settings.VIEWS_FLUSH_INTERVAL)
+        close_old_connections()
+        try:
+            flush_views()
+        except Exception:
+            logger.exception('Не удалось записать просмотры постов')
+
+
+def take_pending_views():
+    global _pending_views
+    with _lock:
+        pending, _pending_views = _pending_views, Counter()
+    return pending
+
+
+def return_pending_views(pending):
+    with _lock:
+        _pending_views.update(pending)
+
+
+def flush_views():
+    """Записывает накопленные просмотры в БД. Возвращает число записанных просмотров"""
+    pending = take_pending_views()
+    if not pending:
+        return 0
+    try:
+        return write_views(pending)
+    except Exception:
+        # Например, «database is locked»: просмотры запишутся при следующем сбросе
+        return_pending_views(pending)
+        raise
+
+
+def write_views(pending):
+    slugs = {slug for slug, _ in pending}
+    post_ids = dict(
+        Post.objects.filter(slug__in=slugs).order_by().values_list('slug', 'id'))
+    views_by_post_id = Counter()
+    views_by_date = defaultdict(Counter)
+    for (slug, viewed_on), views in pending.items():
+        if slug in post_ids:
+            views_by_post_id[post_ids[slug]] += views
+            views_by_date[viewed_on][post_ids[slug]] += views
+    if not views_by_post_id:
+        return 0
+
+    with transaction.atomic():
+        Post.objects.filter(id__in=views_by_post_id).update(
+            views_count=models.F('views_count') + get_increments('id', views_by_post_id)
+        )
+        for viewed_on, day_views in views_by_date.items():
+            PostDailyViews.objects.bulk_create(
+                [PostDailyViews(post_id=post_id, date=viewed_on) for post_id in day_views],
+                ignore_conflicts=True,
+            )
+            PostDailyViews.objects.filter(date=viewed_on, post_id__in=day_views).update(
+                views=models.F('views') + get_increments('post_id', day_views)
+            )
+    return sum(views_by_post_id.values())
+
+
+def get_increments(field, views_by_post_id):
+    return models.Case(
+        *[
+            models.When(**{field: post_id}, then=models.Value(views))
+            for post_id, views in views_by_post_id.items()
+        ],
+        default=models.Value(0),
+    )
+
+
+def count_post_views(view):
+    """
+    Считает просмотр поста, если страница успешно отдана.
+
+    Вешается поверх кеша страниц, чтобы считались и ответы из кеша.
+    Служебные запросы с атрибутом `skip_view_counting`, например
+    из warm_cache, не считаются.
+    """
+    @wraps(view)
+    def wrapper(request, slug, *args, **kwargs):
+        response = view(request, slug, *args, **kwargs)
+        if (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not getattr(request, 'skip_view_counting', False)
+        ):
+            record_view(slug)
+        return response
+
+    return wrapper
+
+
+@atexit.register
+def flush_on_exit():
+    if _flusher_pid == os.getpid():
+        flush_views()
@@ -1,15 +1,40 @@
-from django.shortcuts import render, get_object_or_404
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import redirect, render, get_object_or_404
 from django.db import models
-from blog.models import Comment, Post, Tag
+from blog.archive import get_month_posts
+from blog.models import ArchivedComment, ArchiveMonth, Comment, Post, PostSlugHistory, Tag
+from blog.page_cache import (
+    ARCHIVE_KEY,
+    CONTENT_KEY,
+    POSTS_LIST_KEY,
+    cache_anonymous_page,
+    get_posts_surrogate_keys,
+    get_serialized_surrogate_keys,
+    get_versions,
+    tag_key,
+)
+from blog.slugs import get_post_by_slug
+from blog.view_counters import count_post_views
+
+
+COMMON_CONTEXT_CACHE_KEY = 'blog:common_context'
+COMMON_CONTEXT_CACHE_TIMEOUT = 5 * 60
+POSTS_PER_PAGE = 5
+COMMENTS_PER_PAGE = 20
 
 def serialize_tag(tag):
     return {
+        'id': tag.id,
         'title': tag.title,
         'posts_with_tag': tag.posts_count,
     }
 
 def serialize_post_optimized(post):
     return {
+        'id': post.id,
         'title': post.title,
         'teaser_text': post.text[:200],
         'author': post.author.username,
@@ -22,65 +47,127 @@ def serialize_post_optimized(post):
         'likes_amount': post.likes_count,
     }
 
+def get_common_context_cache_key():
+    # Контекст привязан к версии всего содержимого: после любого сброса
+    # страниц они пересобираются уже со свежими популярными постами и тегами
+    content_version = get_versions([CONTENT_KEY])[CONTENT_KEY]
+    return f'{COMMON_CONTEXT_CACHE_KEY}:{content_version}'
+
 def get_common_context():
-    """Возвращает общие данные для нескольких страниц"""
+    """Возвращает общие данные для нескольких страниц, кешируя их на несколько минут"""
+    return cache.get_or_set(
+        get_common_context_cache_key(),
+        build_common_context,
+        COMMON_CONTEXT_CACHE_TIMEOUT,
+    )
+
+def build_common_context():
     most_popular_posts = Post.objects.popular().with_tags_and_author().fetch_with_comments_count()[:5]
     popular_tags = Tag.objects.popular()[:5]
+    trending_posts = (
+        Post.objects.trending()
+        .with_tags_and_author()
+        .annotate(likes_count=models.Count('likes'))
+        .fetch_with_comments_count()[:5]
+    )
     
     return {
         'most_popular_posts': [serialize_post_optimized(post) for post in most_popular_posts],
         'popular_tags': [serialize_tag(tag) for tag in popular_tags],
+        'trending_posts': [serialize_post_optimized(post) for post in trending_posts],
+        'archive_months': list(ArchiveMonth.objects.values('year', 'month', 'posts_count')),
     }
 
-def index(request):
-    fresh_posts = (
+def get_common_surrogate_keys(context):
+    return get_serialized_surrogate_keys(
+        [*context['most_popular_posts'], *context['trending_posts']],
+        context['popular_tags'],
+    ) | {ARCHIVE_KEY}
+
+@cache_anonymous_page
+def index(request, page=1):
+    paginator = Paginator(
         Post.objects
         .order_by('-published_at')
         .with_tags_and_author()
-        .annotate(likes_count=models.Count('likes'))
-        .fetch_with_comments_count()[:5]
+        .annotate(likes_count=models.Count('likes')),
+        POSTS_PER_PAGE,
     )
+    page_obj = paginator.get_page(page)
+    fresh_posts = page_obj.object_list.fetch_with_comments_count()
     
     context = get_common_context()
     context.update({
         'page_posts': [serialize_post_optimized(post) for post in fresh_posts],
+        'page_obj': page_obj,
     })
     
-    return render(request, 'index.html', context)
+    response = render(request, 'index.html', context)
+    response.surrogate_keys = (
+        get_common_surrogate_keys(context)
+        | get_posts_surrogate_keys(fresh_posts)
+        | {POSTS_LIST_KEY}
+    )
+    return response
 
+@count_post_views
+@cache_anonymous_page
 def post_detail(request, slug):
-    post = get_object_or_404(
+    post = get_post_by_slug(
         Post.objects
         .with_tags_and_author()
-        .prefetch_related(
-            models.Prefetch('comments', queryset=Comment.objects.select_related('author')),
-            'likes'
-        )
+        .prefetch_related('likes')
         .annotate(likes_count=models.Count('likes')),
-        slug=slug
+        slug
     )
+    if post is None:
+        old_slug = get_object_or_404(
+            PostSlugHistory.objects.select_related('post').only('post__slug'),
+            slug=slug,
+        )
+        return redirect('post_detail', slug=old_slug.post.slug, permanent=True)
     
-    post.comments_count = Comment.objects.filter(post=post).count()
+    show_archived = 'archived' in request.GET
+    comments = ArchivedComment.objects if show_archived else Comment.objects
+    comments_page = Paginator(
+        comments.filter(post=post).select_related('author').only(
+            'text', 'published_at', 'author__username'),
+        COMMENTS_PER_PAGE,
+    ).get_page(request.GET.get('comments_page'))
+    if show_archived:
+        post.comments_count = comments_page.paginator.count + Comment.objects.filter(post=post).count()
+    else:
+        post.comments_count = comments_page.paginator.count + post.archived_comments_count
 
     similar_posts = (
         Post.objects
-        .similar(post)
+        .related(post)
         .with_tags_and_author()
         .annotate(likes_count=models.Count('likes'))
         .fetch_with_comments_count()
     )
+    if not similar_posts:
+        similar_posts = (
+            Post.objects
+            .similar(post)
+            .with_tags_and_author()
+            .annotate(likes_count=models.Count('likes'))
+            .fetch_with_comments_count()
+        )
 
     serialized_comments = [{
         'text': comment.text,
         'published_at': comment.published_at,
         'author': comment.author.username,
-    } for comment in post.comments.all()]
+    } for comment in comments_page]
 
     serialized_post = {
         'title': post.title,
         'text': post.text,
         'author': post.author.username,
         'comments': serialized_comments,
+        'comments_amount': post.comments_count,
+        'archived_comments_amount': post.archived_comments_count,
         'likes_amount': post.likes_count,
         'image_url': post.image.url if post.image else None,
         'published_at': post.published_at,
@@ -92,10 +179,18 @@ def post_detail(request, slug):
     context = get_common_context()
     context.update({
         'post': serialized_post,
+        'comments_page': comments_page,
+        'show_archived': show_archived,
     })
     
-    return render(request, 'post-details.html', context)
+    response = render(request, 'post-details.html', context)
+    response.surrogate_keys = (
+        get_common_surrogate_keys(context)
+        | get_posts_surrogate_keys([post, *similar_posts])
+    )
+    return response
 
+@cache_anonymous_page
 def tag_filter(request, tag_title):
     tag = get_object_or_404(Tag.objects.with_posts_count(), title=tag_title)
     
@@ -113,7 +208,57 @@ def tag_filter(request, tag_title):
         'posts': [serialize_post_optimized(post) for post in related_posts],
     })
     
-    return render(request, 'posts-list.html', context)
+    response = render(request, 'posts-list.html', context)
+    response.surrogate_keys = (
+        get_common_surrogate_keys(context)
+        | get_posts_surrogate_keys(related_posts)
+        | {tag_key(tag.id)}
+    )
+    return response
+
+def render_archive(request, posts, heading):
+    """Постраничный список постов автора или месяца"""
+    paginator = Paginator(
+        posts
+        .order_by('-published_at')
+        .with_tags_and_author()
+        .annotate(likes_count=models.Count('likes')),
+        POSTS_PER_PAGE,
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_posts = page_obj.object_list.fetch_with_comments_count()
+
+    context = get_common_context()
+    context.update({
+        'heading': heading,
+        'posts': [serialize_post_optimized(post) for post in page_posts],
+        'page_obj': page_obj,
+    })
+
+    response = render(request, 'posts-list.html', context)
+    response.surrogate_keys = (
+        get_common_surrogate_keys(context)
+        | get_posts_surrogate_keys(page_posts)
+        | {POSTS_LIST_KEY}
+    )
+    return response
+
+@cache_anonymous_page
+def author_posts(request, username):
+    author = get_object_or_404(User.objects.only('id', 'username'), username=username)
+    return render_archive(
+        request,
+        Post.objects.filter(author=author),
+        f'Posts by {author.username}',
+    )
+
+@cache_anonymous_page
+def archive(request, year, month):
+    try:
+        posts = get_month_posts(year, month)
+    except ValueError:
+        raise Http404
+    return render_archive(request, posts, f'Archive: {month:02}.{year}')
 
 def contacts(request):
     context = get_common_context()
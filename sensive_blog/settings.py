@@ -69,6 +69,28 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': env.str(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str('CACHE_LOCATION', ''),
+    }
+}
+# Кеш страниц и карточек не помещается в 300 записей по умолчанию.
+# Redis и Memcached сами следят за памятью и этот параметр не принимают
+if CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', 10000),
+    }
+
+SURROGATE_PURGE_URL = env.str('SURROGATE_PURGE_URL', '')
+
+VIEWS_FLUSH_INTERVAL = env.int('VIEWS_FLUSH_INTERVAL', 10)
+
+COMMENTS_ARCHIVE_AFTER_DAYS = env.int('COMMENTS_ARCHIVE_AFTER_DAYS', 365)
+
+JOBS_RETENTION_DAYS = env.int('JOBS_RETENTION_DAYS', 7)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',  # noqa: E501
@@ -107,4 +129,6 @@ INTERNAL_IPS = [
 
 DEBUG_TOOLBAR_CONFIG = {
     'SHOW_TOOLBAR_CALLBACK': lambda request: DEBUG,
+    # Тулбар и так выключен без DEBUG, поэтому тесты можно запускать с ним
+    'IS_RUNNING_TESTS': False,
 }
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Профиль настроек для продакшена.
+
+Отличается от основных настроек тем, что не подключает debug_toolbar,
+по умолчанию выключает DEBUG, явно включает кеширующий загрузчик шаблонов
+и по умолчанию хранит кеш в файлах, общих для всех воркеров: иначе сброс
+страниц в одном воркере не доходит до остальных.
+
+Запуск: DJANGO_SETTINGS_MODULE=sensive_blog.settings_production
+"""
+import os
+import tempfile
+from copy import deepcopy
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES, env
+
+DEBUG = env.bool('DEBUG', False)
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str(
+            'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': env.str(
+            'CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'sensive_blog_cache')),
+    }
+}
+if CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', 10000),
+    }
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith('debug_toolbar.')
+]
+
+TEMPLATES = deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.template.context_processors.debug'
+]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from blog import views
+from blog import api, views
 from django.conf.urls.static import static
 from django.conf import settings
 
@@ -9,13 +9,21 @@ urlpatterns = [
     path('page/<int:page>', views.index, name='index'),
     path('post/<slug:slug>', views.post_detail, name='post_detail'),
     path('tag/<slug:tag_title>', views.tag_filter, name='tag_filter'),
+    path('author/<str:username>', views.author_posts, name='author_posts'),
+    path('archive/<int:year>/<int:month>', views.archive, name='archive'),
     path('contacts/', views.contacts, name='contacts'),
     path('', views.index, name='index'),
+    path('api/posts', api.posts_list, name='api_posts'),
+    path('api/posts/popular', api.popular_posts_list, name='api_popular_posts'),
+    path('api/posts/trending', api.trending_posts_list, name='api_trending_posts'),
+    path('api/posts/<slug:slug>', api.post_detail, name='api_post_detail'),
+    path('api/tags', api.tags_list, name='api_tags'),
+    path('api/tags/<slug:tag_title>/posts', api.tag_posts_list, name='api_tag_posts'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
-if settings.DEBUG:
+if settings.DEBUG and 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns = [
         path('__debug__/', include(debug_toolbar.urls)),